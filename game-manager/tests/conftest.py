@@ -0,0 +1,29 @@
+"""
+Shared pytest fixtures for game-manager tests.
+
+Provides a session-scoped MCPL client so parametrized runs reuse one
+game-manager subprocess instead of paying spawn + handshake per test.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+from integration_test import PERSISTENT_WRITE_DIR, gm_binary
+from mcpl_client import McplStdioClient
+
+GM_DIR = Path(__file__).parent.parent
+
+
+@pytest.fixture(scope="session")
+def client():
+    """A single connected game-manager client shared across the session."""
+    cmd = [
+        str(gm_binary(GM_DIR)),
+        "--stdio",
+        "--write-dir", str(PERSISTENT_WRITE_DIR),
+    ]
+    with McplStdioClient(cmd, cwd=str(GM_DIR)) as c:
+        yield c
@@ -12,9 +12,11 @@ Usage:
 """
 
 import argparse
+import itertools
 import os
 import re
 import shutil
+import subprocess
 import sys
 import tempfile
 import time
@@ -24,14 +26,61 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 from mcpl_client import McplStdioClient
 
+_CHANNEL_RE = re.compile(r"channel: (game:[a-zA-Z0-9_-]+)")
+
 
 def wait_for_file(path: Path, timeout: float = 30.0) -> bool:
+    """Wait until `path` exists and is non-empty.
+
+    Uses inotify on the parent directory where available so we wake as soon
+    as the kernel delivers the create/write event; falls back to polling.
+    """
     deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        if path.exists() and path.stat().st_size > 0:
-            return True
-        time.sleep(0.5)
-    return False
+    # Check before waiting — the file may already be there.
+    if path.exists() and path.stat().st_size > 0:
+        return True
+
+    try:
+        import inotify_simple as ino
+    except ImportError:
+        # No inotify (non-Linux or package missing): plain polling.
+        while time.monotonic() < deadline:
+            if path.exists() and path.stat().st_size > 0:
+                return True
+            time.sleep(0.5)
+        return False
+
+    def _open_quiet(p: Path) -> int:
+        try:
+            return os.open(p, os.O_RDONLY | os.O_NONBLOCK)
+        except FileNotFoundError:
+            return -1
+
+    with ino.INotify() as inotify:
+        inotify.add_watch(
+            str(path.parent),
+            ino.flags.CREATE | ino.flags.MODIFY | ino.flags.CLOSE_WRITE,
+        )
+        # Once the file exists we hold an fd and fstat it on each write
+        # event, avoiding a path lookup + stat per wake-up.
+        fd = _open_quiet(path)  # re-check closes the create race
+        try:
+            if fd >= 0 and os.fstat(fd).st_size > 0:
+                return True
+            while True:
+                remaining_ms = (deadline - time.monotonic()) * 1000
+                if remaining_ms <= 0:
+                    return False
+                for event in inotify.read(timeout=remaining_ms):
+                    if event.name != path.name:
+                        continue
+                    if fd < 0:
+                        fd = _open_quiet(path)
+                    if fd >= 0 and os.fstat(fd).st_size > 0:
+                        return True
+        finally:
+            if fd >= 0:
+                os.close(fd)
 
 
 def extract_channel_id(result: dict) -> str:
@@ -39,7 +88,7 @@ def extract_channel_id(result: dict) -> str:
     content = result.get("content", [])
     for block in content:
         text = block.get("text", "")
-        match = re.search(r"channel: (game:[a-zA-Z0-9_-]+)", text)
+        match = _CHANNEL_RE.search(text)
         if match:
             return match.group(1)
     raise ValueError(f"Could not extract channel_id from: {result}")
@@ -48,6 +97,23 @@ def extract_channel_id(result: dict) -> str:
 PERSISTENT_WRITE_DIR = Path.home() / ".spring-test-agent"
 
 
+def gm_binary(gm_dir: Path, release: bool = False) -> Path:
+    """Path to the compiled game-manager binary, building it if needed.
+
+    Invoking the binary directly skips cargo's per-run dependency check
+    and linker probe; the one-shot `cargo build` here is a no-op when the
+    build is already up to date.
+    """
+    profile = "release" if release else "debug"
+    binary = gm_dir / "target" / profile / "game-manager"
+    build_cmd = ["cargo", "build"]
+    if release:
+        build_cmd.append("--release")
+    if not binary.exists():
+        subprocess.run(build_cmd, check=True, cwd=gm_dir)
+    return binary
+
+
 class IntegrationTest:
     def __init__(self, args):
         self.tier = args.tier
@@ -58,6 +124,7 @@ class IntegrationTest:
         self.timeout = args.timeout
         self.fresh = args.fresh
         self.player_mode = args.player_mode
+        self.release = args.release
         if self.fresh:
             self.write_dir = Path(tempfile.mkdtemp(prefix="gm-integration-"))
         else:
@@ -120,16 +187,12 @@ class IntegrationTest:
     def _start_client(self):
         print("--- Starting game-manager ---")
         cmd = [
-            "cargo", "run", "--",
+            str(gm_binary(self.gm_dir, release=self.release)),
             "--stdio",
             "--write-dir", str(self.write_dir),
         ]
         self.client = McplStdioClient(cmd, cwd=str(self.gm_dir), verbose=self.verbose)
-
-        # Wait a moment for cargo build + startup
-        time.sleep(0.5)
-
-        result = self.client.handshake()
+        result = self.client.connect()
         server_name = result.get("serverInfo", {}).get("name", "unknown")
         self.check(server_name == "zk-game-manager", f"Handshake complete (server: {server_name})")
 
@@ -168,10 +231,10 @@ class IntegrationTest:
         self.check(found, f"infolog.txt created (took {elapsed:.1f}s)")
 
         if found and self.verbose:
-            # Print first few lines of infolog
-            lines = infolog.read_text().splitlines()[:10]
-            for line in lines:
-                print(f"    | {line}")
+            # Print first few lines of infolog without slurping the whole file
+            with infolog.open("r", errors="replace") as f:
+                for line in itertools.islice(f, 10):
+                    print(f"    | {line.rstrip()}")
 
     def _tier2_sai_boot(self):
         print("\n--- Tier 2: SAI Boot Verification ---")
@@ -188,7 +251,7 @@ class IntegrationTest:
             self.warn("SAI bridge did not connect — check infolog.txt for errors")
             # Print recent stderr for debugging
             if self.client.stderr_lines:
-                recent = self.client.stderr_lines[-10:]
+                recent = list(self.client.stderr_lines)[-10:]
                 for line in recent:
                     print(f"    | {line}")
             return
@@ -233,15 +296,9 @@ class IntegrationTest:
         # Collect events for a few seconds to observe more activity
         push_events, sai_events = self.client.collect_events(timeout=10)
 
-        # Count unit events across ALL accumulated SAI events (including from tier 2)
-        unit_event_count = 0
-        for evt in self.client.sai_events:
-            messages = evt.get("messages", [])
-            for m in messages:
-                for block in m.get("content", []):
-                    text = block.get("text", "")
-                    if any(t in text for t in ["unit_created", "unit_finished", "unit_idle"]):
-                        unit_event_count += 1
+        # Unit events across ALL accumulated SAI events (including from
+        # tier 2) — counted incrementally at dispatch time.
+        unit_event_count = self.client.unit_event_count
 
         if unit_event_count > 0:
             self.check(True, f"Received {unit_event_count} unit events from SAI")
@@ -254,18 +311,25 @@ class IntegrationTest:
     def _cleanup(self):
         print("\n--- Cleanup ---")
         if self.client:
-            self.client.close()
+            self.client.disconnect()
             print(f"  Game-manager stopped")
 
         if self.write_dir.exists():
             # Check infolog for errors before removing
             infolog = self.write_dir / "infolog.txt"
             if infolog.exists():
-                content = infolog.read_text()
-                error_lines = [l for l in content.splitlines() if "[Error]" in l or "[Fatal]" in l]
+                # Stream the scan — infologs from failed runs can be many MB,
+                # and we only report the first few errors anyway.
+                error_lines = []
+                with infolog.open("r", errors="replace") as f:
+                    for line in f:
+                        if "[Error]" in line or "[Fatal]" in line:
+                            error_lines.append(line.rstrip())
+                            if len(error_lines) >= 5:
+                                break
                 if error_lines:
                     print(f"  Engine errors found in infolog.txt:")
-                    for line in error_lines[:5]:
+                    for line in error_lines:
                         print(f"    | {line}")
 
             if self.fresh:
@@ -294,6 +358,8 @@ def main():
                         help="Opponent AI shortname")
     parser.add_argument("--timeout", type=float, default=120,
                         help="Timeout in seconds for engine operations")
+    parser.add_argument("--release", action="store_true",
+                        help="Use the release build of game-manager instead of debug")
     parser.add_argument("--fresh", action="store_true",
                         help="Use a fresh tempdir (slow: full archive rescan). Default: persistent ~/.spring-test-agent")
     parser.add_argument("--player-mode", action="store_true",
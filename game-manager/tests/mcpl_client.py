@@ -6,8 +6,13 @@ Handles bidirectional communication: sends requests, receives responses,
 and auto-responds to server-initiated requests (push/event, channels/incoming).
 """
 
+import collections
+import concurrent.futures
 import json
 import os
+import queue
+import select
+import selectors
 import signal
 import subprocess
 import sys
@@ -16,46 +21,122 @@ import time
 from pathlib import Path
 from typing import Any, Optional
 
+# orjson is several times faster than the stdlib and works directly on bytes
+# (dumps returns bytes, loads accepts them), skipping a UTF-8 round-trip per
+# message. The stdlib shims below keep it an optional dependency.
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    _loads = json.loads
+
+# SAI event types that indicate units exist and the game is ticking
+_UNIT_EVENT_TYPES = frozenset({"unit_created", "unit_finished", "unit_idle"})
+
+# Byte template for channels/publish so repeated commands only pay for
+# substitution, not a full envelope re-serialization per send.
+_PUBLISH_ENVELOPE = (
+    b'{"jsonrpc":"2.0","id":__ID__,"method":"channels/publish",'
+    b'"params":{"channelId":__CHAN__,"content":[{"type":"text","text":__CMD__}]}}\n'
+)
+
 
 class McplStdioClient:
     """Mock MCPL client that communicates with game-manager over stdio."""
 
     def __init__(self, cmd: list[str], cwd: Optional[str] = None, verbose: bool = False):
+        self.cmd = cmd
+        self.cwd = cwd
         self.verbose = verbose
+        self.proc: Optional[subprocess.Popen] = None
+        self.server_info: dict = {}
+
+    def connect(self) -> dict:
+        """Spawn the subprocess, start reader threads, and perform the handshake.
+
+        Returns the initialize result. The client can be reused across
+        multiple test runs — call once and keep the session open rather than
+        paying spawn + handshake cost per invocation.
+        """
+        if self.proc is not None:
+            raise RuntimeError("Client already connected")
+
         self.proc = subprocess.Popen(
-            cmd,
+            self.cmd,
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            cwd=cwd,
-            preexec_fn=os.setsid,  # new process group so we can kill children
+            cwd=self.cwd,
+            bufsize=0,  # unbuffered stdin: each message write hits the pipe immediately
+            start_new_session=True,  # new process group so we can kill children
         )
         self._next_id = 1
         self._lock = threading.Lock()
 
-        # Pending request tracking: id -> {event, result}
-        self._pending: dict[int, dict] = {}
+        # Pending request tracking: id -> Future resolved with the response
+        self._pending: dict[int, concurrent.futures.Future] = {}
+
+        # Server-request routing: one hashed lookup per message in _dispatch
+        self._handlers = {
+            "push/event": self._on_push_event,
+            "channels/incoming": self._on_channels_incoming,
+            "channels/changed": self._on_channels_changed,
+        }
 
         # Incoming events from server
         self.push_events: list[dict] = []
         self.sai_events: list[dict] = []
         self.notifications: list[dict] = []
-
-        # Start reader threads
+        # Signals waiters (wait_for_sai_event, collect_events) on any
+        # incoming push/SAI event.
+        self._event_cv = threading.Condition()
+        self._last_event_at = time.monotonic()
+        # Parsed SAI events indexed by their "type" field, filled in _dispatch
+        # so waiters do an O(1) lookup instead of scanning sai_events.
+        self._sai_by_type: dict[str, collections.deque] = collections.defaultdict(collections.deque)
+        self._unit_event_count = 0
+
+        # Stderr capture, bounded — a chatty engine can emit hundreds of MB
+        # over a long run and we only ever report the tail.
+        self.stderr_lines: collections.deque[str] = collections.deque(maxlen=2048)
+
+        # Outbound messages are serialized by a single writer thread, which
+        # also coalesces bursts of acks into one write syscall and removes
+        # stdin contention between the reader thread and _request callers.
+        self._outbound_q: queue.Queue = queue.Queue()
+
+        # Wakeup pipe so disconnect() can end the IO loop without EOF
+        self._wake_r, self._wake_w = os.pipe()
+
+        # Start IO threads: one selectors loop for both read pipes, plus the
+        # batching writer.
         self._alive = True
-        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
-        self._reader_thread.start()
-        self._stderr_thread = threading.Thread(target=self._stderr_loop, daemon=True)
-        self._stderr_thread.start()
+        self._io_thread = threading.Thread(target=self._io_loop, daemon=True)
+        self._io_thread.start()
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
+
+        result = self.handshake()
+        self.server_info = result.get("serverInfo", {})
+        return result
 
-        # Stderr capture
-        self.stderr_lines: list[str] = []
+    def __enter__(self) -> "McplStdioClient":
+        self.connect()
+        return self
 
-    def _log(self, direction: str, msg: dict):
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disconnect()
+
+    def _log(self, direction: str, data: bytes):
         if self.verbose:
-            text = json.dumps(msg, separators=(",", ":"))
-            if len(text) > 200:
-                text = text[:200] + "..."
+            text = data[:200].decode(errors="replace").rstrip()
+            if len(data) > 200:
+                text += "..."
             print(f"  [{direction}] {text}", file=sys.stderr)
 
     def _next_request_id(self) -> int:
@@ -65,47 +146,109 @@ class McplStdioClient:
             return rid
 
     def _send(self, msg: dict):
-        self._log(">>>", msg)
-        line = json.dumps(msg) + "\n"
-        self.proc.stdin.write(line.encode())
-        self.proc.stdin.flush()
+        data = _dumps(msg) + b"\n"
+        self._log(">>>", data)
+        self._outbound_q.put(data)
 
-    def _send_response(self, msg_id: int, result: Any):
-        self._send({"jsonrpc": "2.0", "id": msg_id, "result": result})
+    def _write_loop(self):
+        """Background thread: drain the outbound queue and batch writes.
 
-    def _read_loop(self):
-        """Background thread: read lines from stdout and dispatch."""
-        while self._alive:
-            try:
-                line = self.proc.stdout.readline()
-                if not line:
-                    break
-                line = line.decode().strip()
-                if not line:
-                    continue
-                msg = json.loads(line)
-                self._log("<<<", msg)
-                self._dispatch(msg)
-            except (json.JSONDecodeError, ValueError) as e:
-                if self.verbose:
-                    print(f"  [ERR] Parse error: {e}", file=sys.stderr)
-            except Exception:
+        Blocks for the first message, then grabs everything else already
+        queued so a burst of event acks goes out as one write + flush.
+        """
+        stdin = self.proc.stdin
+        while True:
+            item = self._outbound_q.get()
+            if item is None:
                 break
-
-    def _stderr_loop(self):
-        """Background thread: capture stderr."""
-        while self._alive:
-            try:
-                line = self.proc.stderr.readline()
-                if not line:
+            parts = [item]
+            stop = False
+            while True:
+                try:
+                    nxt = self._outbound_q.get_nowait()
+                except queue.Empty:
                     break
-                text = line.decode().rstrip()
-                self.stderr_lines.append(text)
-                if self.verbose:
-                    print(f"  [gm] {text}", file=sys.stderr)
-            except Exception:
+                if nxt is None:
+                    stop = True
+                    break
+                parts.append(nxt)
+            try:
+                stdin.write(b"".join(parts))
+                stdin.flush()
+            except (BrokenPipeError, ValueError, OSError):
+                break
+            if stop:
                 break
 
+    def _send_response(self, msg_id: int, result: Any):
+        self._send({"jsonrpc": "2.0", "id": msg_id, "result": result})
+
+    def _io_loop(self):
+        """Background thread: one selectors loop over stdout and stderr.
+
+        A single thread servicing both pipes halves thread wake-ups and
+        keeps processing order deterministic. Reads are chunked into per-fd
+        buffers and split on newlines; the wakeup pipe lets disconnect()
+        end the loop without waiting for pipe EOF.
+        """
+        stdout_fd = self.proc.stdout.fileno()
+        stderr_fd = self.proc.stderr.fileno()
+        handlers = {
+            stdout_fd: self._handle_stdout_line,
+            stderr_fd: self._handle_stderr_line,
+        }
+        buffers = {stdout_fd: bytearray(), stderr_fd: bytearray()}
+
+        sel = selectors.DefaultSelector()
+        sel.register(stdout_fd, selectors.EVENT_READ)
+        sel.register(stderr_fd, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        open_pipes = 2
+        try:
+            while self._alive and open_pipes:
+                for key, _ in sel.select():
+                    fd = key.fd
+                    if fd == self._wake_r:
+                        os.read(self._wake_r, 4096)
+                        continue
+                    try:
+                        chunk = os.read(fd, 65536)
+                    except OSError:
+                        chunk = b""
+                    if not chunk:
+                        sel.unregister(fd)
+                        open_pipes -= 1
+                        continue
+                    buf = buffers[fd]
+                    buf += chunk
+                    while True:
+                        nl = buf.find(b"\n")
+                        if nl < 0:
+                            break
+                        line = bytes(buf[:nl + 1])
+                        del buf[:nl + 1]
+                        handlers[fd](line)
+        finally:
+            sel.close()
+
+    def _handle_stdout_line(self, line: bytes):
+        if not line.strip():
+            return
+        try:
+            msg = _loads(line)
+        except ValueError as e:
+            if self.verbose:
+                print(f"  [ERR] Parse error: {e}", file=sys.stderr)
+            return
+        self._log("<<<", line)
+        self._dispatch(msg)
+
+    def _handle_stderr_line(self, line: bytes):
+        text = line.decode(errors="replace").rstrip()
+        self.stderr_lines.append(text)
+        if self.verbose:
+            print(f"  [gm] {text}", file=sys.stderr)
+
     def _dispatch(self, msg: dict):
         has_id = "id" in msg
         has_method = "method" in msg
@@ -114,33 +257,59 @@ class McplStdioClient:
 
         if has_id and (has_result or has_error):
             # Response to our request
-            msg_id = msg["id"]
-            if msg_id in self._pending:
-                self._pending[msg_id]["result"] = msg
-                self._pending[msg_id]["event"].set()
+            fut = self._pending.pop(msg["id"], None)
+            if fut is not None:
+                fut.set_result(msg)
 
         elif has_id and has_method:
             # Server-initiated request — must respond
-            method = msg["method"]
-            params = msg.get("params", {})
-
-            if method == "push/event":
-                self.push_events.append(params)
-                self._send_response(msg["id"], {"accepted": True})
-            elif method == "channels/incoming":
-                self.sai_events.append(params)
-                self._send_response(msg["id"], {})
-            elif method == "channels/changed":
-                self.notifications.append({"method": method, "params": params})
-                self._send_response(msg["id"], {})
-            else:
-                # Unknown server request — respond with empty result
-                self._send_response(msg["id"], {})
+            handler = self._handlers.get(msg["method"], self._on_unknown_request)
+            handler(msg)
 
         elif has_method and not has_id:
             # Notification from server
             self.notifications.append(msg)
 
+    def _on_push_event(self, msg: dict):
+        with self._event_cv:
+            self.push_events.append(msg.get("params", {}))
+            self._last_event_at = time.monotonic()
+            self._event_cv.notify_all()
+        self._send_response(msg["id"], {"accepted": True})
+
+    def _on_channels_incoming(self, msg: dict):
+        params = msg.get("params", {})
+        # Parse content blocks once here so waiters read cached dicts
+        # instead of re-parsing raw text on every scan.
+        parsed_blocks = []
+        for m in params.get("messages", []):
+            for block in m.get("content", []):
+                try:
+                    parsed = _loads(block.get("text", ""))
+                except (ValueError, TypeError):
+                    continue
+                block["_parsed"] = parsed
+                if isinstance(parsed, dict):
+                    parsed_blocks.append(parsed)
+        with self._event_cv:
+            self.sai_events.append(params)
+            for parsed in parsed_blocks:
+                ptype = parsed.get("type")
+                self._sai_by_type[ptype].append(parsed)
+                if ptype in _UNIT_EVENT_TYPES:
+                    self._unit_event_count += 1
+            self._last_event_at = time.monotonic()
+            self._event_cv.notify_all()
+        self._send_response(msg["id"], {})
+
+    def _on_channels_changed(self, msg: dict):
+        self.notifications.append({"method": msg["method"], "params": msg.get("params", {})})
+        self._send_response(msg["id"], {})
+
+    def _on_unknown_request(self, msg: dict):
+        # Unknown server request — respond with empty result
+        self._send_response(msg["id"], {})
+
     def _request(self, method: str, params: Optional[dict] = None, timeout: float = 30) -> dict:
         """Send a JSON-RPC request and wait for the response."""
         msg_id = self._next_request_id()
@@ -148,17 +317,20 @@ class McplStdioClient:
         if params is not None:
             msg["params"] = params
 
-        entry = {"event": threading.Event(), "result": None}
-        self._pending[msg_id] = entry
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        self._pending[msg_id] = fut
 
         self._send(msg)
 
-        if not entry["event"].wait(timeout=timeout):
-            del self._pending[msg_id]
-            raise TimeoutError(f"Timed out waiting for response to {method} (id={msg_id})")
+        return self._await_response(msg_id, fut, method, timeout)
 
-        result_msg = entry["result"]
-        del self._pending[msg_id]
+    def _await_response(self, msg_id: int, fut: concurrent.futures.Future,
+                        method: str, timeout: float) -> dict:
+        try:
+            result_msg = fut.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            self._pending.pop(msg_id, None)
+            raise TimeoutError(f"Timed out waiting for response to {method} (id={msg_id})") from None
 
         if "error" in result_msg:
             raise RuntimeError(f"RPC error: {result_msg['error']}")
@@ -209,68 +381,162 @@ class McplStdioClient:
 
     def publish(self, channel_id: str, command: dict) -> dict:
         """Send a SAI command via channels/publish."""
-        return self._request("channels/publish", {
-            "channelId": channel_id,
-            "content": [{"type": "text", "text": json.dumps(command)}],
-        })
+        return self.publish_raw(channel_id, _dumps(command))
+
+    def publish_raw(self, channel_id: str, serialized_command: bytes,
+                    timeout: float = 30) -> dict:
+        """Send an already-serialized SAI command via channels/publish.
 
-    def collect_events(self, timeout: float = 5.0) -> tuple[list[dict], list[dict]]:
-        """Wait for `timeout` seconds, then return (push_events, sai_events) accumulated."""
+        Splices the command bytes into a pre-built envelope template, so
+        callers issuing many commands serialize each one exactly once.
+        """
+        msg_id = self._next_request_id()
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        self._pending[msg_id] = fut
+
+        data = (
+            _PUBLISH_ENVELOPE
+            .replace(b"__ID__", b"%d" % msg_id)
+            .replace(b"__CHAN__", _dumps(channel_id))
+            .replace(b"__CMD__", _dumps(serialized_command.decode()))
+        )
+        self._log(">>>", data)
+        self._outbound_q.put(data)
+
+        return self._await_response(msg_id, fut, "channels/publish", timeout)
+
+    @property
+    def unit_event_count(self) -> int:
+        """Unit lifecycle events (created/finished/idle) seen so far.
+
+        Maintained incrementally in `_dispatch`, so reading it is O(1)
+        versus re-walking every accumulated SAI event.
+        """
+        return self._unit_event_count
+
+    def reset_counters(self):
+        """Zero the incremental event counters (e.g. between test tiers)."""
+        with self._event_cv:
+            self._unit_event_count = 0
+
+    def collect_events(
+        self,
+        timeout: float = 5.0,
+        min_events: Optional[int] = None,
+        quiet_period: float = 1.5,
+    ) -> tuple[list[dict], list[dict]]:
+        """Collect events until the stream goes quiet or `timeout` elapses.
+
+        Returns early once `min_events` new events have arrived (if given),
+        or once at least one event has arrived and the stream then stayed
+        idle for `quiet_period` seconds. Returns the (push_events,
+        sai_events) accumulated during the call.
+        """
         start_push = len(self.push_events)
         start_sai = len(self.sai_events)
-        time.sleep(timeout)
+        deadline = time.monotonic() + timeout
+        with self._event_cv:
+            while True:
+                now = time.monotonic()
+                new_count = (len(self.push_events) - start_push) + (len(self.sai_events) - start_sai)
+                if min_events is not None and new_count >= min_events:
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    break
+                if new_count > 0:
+                    idle = now - self._last_event_at
+                    if idle >= quiet_period:
+                        break
+                    wait_for = min(remaining, quiet_period - idle)
+                else:
+                    wait_for = remaining
+                self._event_cv.wait(timeout=wait_for)
         return (
             self.push_events[start_push:],
             self.sai_events[start_sai:],
         )
 
     def wait_for_sai_event(self, event_type: str, timeout: float = 30.0) -> Optional[dict]:
-        """Wait until a SAI event of the given type appears."""
+        """Wait until a SAI event of the given type appears.
+
+        Pops from the per-type index maintained by `_dispatch`, blocking on
+        its Condition, so arrival latency is bounded by thread wake-up time
+        rather than a poll interval and lookup cost is O(1).
+        """
         deadline = time.monotonic() + timeout
-        while time.monotonic() < deadline:
-            for evt in self.sai_events:
-                messages = evt.get("messages", [])
-                for m in messages:
-                    for block in m.get("content", []):
-                        text = block.get("text", "")
-                        try:
-                            parsed = json.loads(text)
-                            if parsed.get("type") == event_type:
-                                return parsed
-                        except (json.JSONDecodeError, TypeError):
-                            if f'"type":"{event_type}"' in text or f'"type": "{event_type}"' in text:
-                                return {"_raw": text}
-            time.sleep(0.5)
-        return None
-
-    def close(self):
+        with self._event_cv:
+            while True:
+                pending = self._sai_by_type.get(event_type)
+                if pending:
+                    return pending.popleft()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._event_cv.wait(timeout=remaining)
+
+    def disconnect(self):
         """Stop the subprocess and all its children.
 
         Sends SIGTERM to the process group first (game-manager + engine),
         then SIGKILL as fallback. Using process groups ensures the engine
         child is killed even if game-manager doesn't get to run destructors.
+        On Linux >= 5.3 exit is awaited through a pidfd, which becomes
+        readable the moment the process dies and is immune to PID reuse.
         """
+        if self.proc is None:
+            return
         self._alive = False
+        self._outbound_q.put(None)  # wake and stop the writer thread
+        try:
+            os.write(self._wake_w, b"x")  # wake the IO loop so it can exit
+        except OSError:
+            pass
         pgid = None
         try:
             pgid = os.getpgid(self.proc.pid)
         except (ProcessLookupError, OSError):
             pass
 
-        try:
+        pidfd = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(self.proc.pid)
+            except OSError:
+                pidfd = None
+
+        def _signal_tree(sig):
             if pgid:
-                os.killpg(pgid, signal.SIGTERM)
+                os.killpg(pgid, sig)
+            else:
+                self.proc.send_signal(sig)
+
+        try:
+            if pidfd is not None:
+                _signal_tree(signal.SIGTERM)
+                readable, _, _ = select.select([pidfd], [], [], 5.0)
+                if not readable:
+                    _signal_tree(signal.SIGKILL)
+                    select.select([pidfd], [], [], 5.0)
+                self.proc.wait(timeout=1)  # reap the zombie
             else:
-                self.proc.terminate()
-            self.proc.wait(timeout=5)
+                _signal_tree(signal.SIGTERM)
+                self.proc.wait(timeout=5)
         except subprocess.TimeoutExpired:
             try:
-                if pgid:
-                    os.killpg(pgid, signal.SIGKILL)
-                else:
-                    self.proc.kill()
+                _signal_tree(signal.SIGKILL)
                 self.proc.wait(timeout=5)
             except Exception:
                 pass
         except Exception:
             pass
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+            self._io_thread.join(timeout=1)
+            for fd in (self._wake_r, self._wake_w):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self.proc = None